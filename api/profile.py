@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from config import CONFIG
+from utils.profiler import SAMPLER
+
+router = APIRouter()
+
+
+@router.get("/profile")
+async def hot_stacks(limit: int = 20, reset: bool = False):
+    """返回统计采样得到的热点调用栈"""
+    result = SAMPLER.hot_stacks(limit)
+    result["sample_rate"] = CONFIG.PROFILE_SAMPLE_RATE
+    if reset:
+        SAMPLER.reset()
+    return result
@@ -1,63 +1,159 @@
 from datetime import timedelta
-from fastapi import Depends, FastAPI, HTTPException, Response, status
+import time
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
 from fastapi.concurrency import asynccontextmanager
 from fastapi.security import OAuth2PasswordRequestForm
 import uvicorn
-from api import report, query, admin
-from tortoise import Tortoise
+from api import report, query, admin, profile
+from tortoise import Tortoise, connections
 from config import CONFIG
 from starlette.types import ASGIApp, Scope, Receive, Send
 from fastapi.logger import logger
 from fastapi.middleware.cors import CORSMiddleware
-
+from fastapi.responses import JSONResponse
+
+from utils.admission import LIMITERS, Overloaded
+from utils.profiler import (
+    SAMPLER,
+    ProfiledJSONResponse,
+    ProfileMiddleware,
+    install_slow_query_log,
+    phase,
+)
 from utils.security import authenticate_user, create_access_token, require_login
 
 
+AUTH_PREFIXES = ("/api/admin",)
+"""需要从 Cookie 中读取 token 的路径前缀，其余公开接口跳过认证处理"""
+
+
 class AuthMiddleware:
+    """认证及 CORS 中间件
+
+    仅后台接口处理 Cookie，不带 Origin 的请求跳过 CORS 处理
+    """
+
     def __init__(self, app: ASGIApp):
         self.app = app
+        self.cors_app = CORSMiddleware(
+            app,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
-        if scope["type"] in ("http", "websocket"):
-            headers = dict(scope.get("headers", []))
-            if cookie_header := headers.get(b"cookie"):
-                cookie_str = cookie_header.decode()
-                cookies = {}
-                for item in cookie_str.split(";"):
-                    if "=" in item:
-                        k, v = item.strip().split("=", 1)
-                        cookies[k.strip()] = v.strip()
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith(AUTH_PREFIXES):
+            with phase("auth"):
+                self.inject_cookie_token(scope)
+
+        app = self.app
+        for key, _ in scope["headers"]:
+            if key == b"origin":
+                app = self.cors_app
+                break
+        await app(scope, receive, send)
+
+    @staticmethod
+    def inject_cookie_token(scope: Scope):
+        cookie = None
+        for key, value in scope["headers"]:
+            if key == b"authorization":
+                return
+            if key == b"cookie":
+                cookie = value
+        if cookie is None:
+            return
+
+        for item in cookie.split(b";"):
+            name, sep, value = item.partition(b"=")
+            if sep and name.strip() == b"Authorization":
+                auth_token = value.strip()
+                if not auth_token.startswith(b"Bearer "):
+                    auth_token = b"Bearer " + auth_token
+                scope["headers"].append((b"authorization", auth_token))
+                return
+
+
+ROUTE_CLASSES = (
+    ("/api/public_banlist", "lookup"),
+    ("/api/report", "report"),
+    ("/api/admin", "admin"),
+    ("/login", "login"),
+)
+"""按路径前缀划分的请求类别，/api/banlist 命中缓存时不占用名额，仅在回源数据库时限制"""
+
+
+def overloaded_response(exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service overloaded"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class AdmissionMiddleware:
+    """按请求类别限制并发，过载时快速返回503"""
 
-                auth_token = cookies.get("Authorization")
-                if auth_token and b"authorization" not in headers:
-                    if not auth_token.startswith("Bearer "):
-                        auth_token = f"Bearer {auth_token}"
-                    scope["headers"].append((b"authorization", auth_token.encode()))
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        await self.app(scope, receive, send)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        for prefix, kind in ROUTE_CLASSES:
+            if path.startswith(prefix):
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = LIMITERS[kind]
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            await overloaded_response(e)(scope, receive, send)
+            return
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - start)
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await Tortoise.init(db_url="sqlite://cloudban.db", modules={"models": ["models"]})
     await Tortoise.generate_schemas()
+    if CONFIG.PROFILE_ENABLED:
+        install_slow_query_log(type(connections.get("default")))
+        if CONFIG.PROFILE_SAMPLE_RATE > 0:
+            SAMPLER.start()
     yield
+    if CONFIG.PROFILE_ENABLED and CONFIG.PROFILE_SAMPLE_RATE > 0:
+        SAMPLER.stop()
     await Tortoise.close_connections()
 
 
-if CONFIG.DEBUG:
-    app = FastAPI(lifespan=lifespan)
-else:
-    app = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+app_kwargs = {}
+if not CONFIG.DEBUG:
+    app_kwargs.update(docs_url=None, redoc_url=None, openapi_url=None)
+if CONFIG.PROFILE_ENABLED:
+    app_kwargs["default_response_class"] = ProfiledJSONResponse
+app = FastAPI(lifespan=lifespan, **app_kwargs)
 
-app.add_middleware(AuthMiddleware)  # 认证中间件
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+if CONFIG.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)  # 并发限制中间件
+app.add_middleware(AuthMiddleware)  # 认证及CORS中间件
+if CONFIG.PROFILE_ENABLED:
+    app.add_middleware(ProfileMiddleware)  # 性能分析中间件
 # 注册路由
 app.include_router(
     report.router,
@@ -69,6 +165,13 @@ app.include_router(
     prefix="/api",
     tags=["查询接口"],
 )
+if CONFIG.PROFILE_ENABLED:
+    app.include_router(
+        profile.router,
+        prefix="/api/admin",
+        tags=["性能分析"],
+        dependencies=[Depends(require_login)],
+    )
 # app.include_router(
 #     admin.router,
 #     prefix="/api/admin",
@@ -77,6 +180,11 @@ app.include_router(
 # )
 
 
+@app.exception_handler(Overloaded)
+async def _(_: Request, exc: Overloaded):
+    return overloaded_response(exc)
+
+
 @app.post("/login")
 async def _(
     response: Response,
@@ -29,6 +29,36 @@ class Config(BaseModel):
     """Redis数据库"""
     REDIS_PASSWORD: str = ""
     """Redis密码"""
+    PROFILE_ENABLED: bool = False
+    """是否开启性能分析(慢请求/慢查询日志)"""
+    SLOW_REQUEST_MS: float = 500
+    """慢请求阈值(毫秒)"""
+    SLOW_QUERY_MS: float = 100
+    """慢查询阈值(毫秒)"""
+    PROFILE_SAMPLE_RATE: float = 0.0
+    """统计采样的请求比例，0~1，0为不采样"""
+    PROFILE_INTERVAL_MS: float = 5
+    """统计采样间隔(毫秒)"""
+    ADMISSION_ENABLED: bool = True
+    """是否开启并发限制(过载时返回503)"""
+    ADMISSION_TIMEOUT: float = 3
+    """请求排队最长等待时间(秒)"""
+    LOOKUP_CONCURRENCY: int = 16
+    """查询接口访问数据库的最大并发数"""
+    LOOKUP_QUEUE: int = 64
+    """查询接口最大排队数"""
+    REPORT_CONCURRENCY: int = 4
+    """上报接口最大并发数"""
+    REPORT_QUEUE: int = 32
+    """上报接口最大排队数"""
+    ADMIN_CONCURRENCY: int = 2
+    """后台接口最大并发数"""
+    ADMIN_QUEUE: int = 8
+    """后台接口最大排队数"""
+    LOGIN_CONCURRENCY: int = 2
+    """登录接口最大并发数"""
+    LOGIN_QUEUE: int = 8
+    """登录接口最大排队数"""
 
 
 try:
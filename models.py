@@ -1,5 +1,6 @@
 from tortoise import fields
 from tortoise.models import Model
+from utils.admission import admit
 from utils.cache import redis_get, redis_set
 import ujson
 
@@ -14,7 +15,9 @@ class CachedModel(Model):
         cached = await redis_get(key)
         if cached:
             return cls(**ujson.loads(cached))
-        obj = await cls.get(**kwargs)
+        # 命中缓存的请求不占用名额，仅回源数据库时限制并发
+        async with admit("lookup"):
+            obj = await cls.get(**kwargs)
         await redis_set(key, ujson.dumps(obj.__dict__), expire=300)
         return obj
 
@@ -24,7 +27,8 @@ class CachedModel(Model):
         cached = await redis_get(key)
         if cached:
             return [cls(**item) for item in ujson.loads(cached)]
-        objs = await cls.filter(**kwargs)
+        async with admit("lookup"):
+            objs = await cls.filter(**kwargs)
         data = [obj.__dict__ for obj in objs]
         await redis_set(key, ujson.dumps(data), expire=300)
         return objs
@@ -0,0 +1,112 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager, nullcontext
+
+from config import CONFIG
+
+
+class Overloaded(Exception):
+    """并发已满且无法在期限内排到，应返回503"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+        """建议客户端重试间隔(秒)"""
+
+
+class Limiter:
+    """带有限排队和等待期限的并发限制器"""
+
+    def __init__(self, concurrency: int, max_queue: int, timeout: float):
+        self.concurrency = max(concurrency, 1)
+        """最大并发数"""
+        self.max_queue = max(max_queue, 0)
+        """最大排队数"""
+        self.timeout = timeout
+        """排队最长等待时间(秒)"""
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service = 0.05
+        """占用名额时长的滑动平均(秒)，用于估算排队时间"""
+
+    def estimate_wait(self) -> float:
+        """估算新请求排到所需的时间(秒)"""
+        return (len(self._waiters) + 1) * self._service / self.concurrency
+
+    def _reject(self) -> Overloaded:
+        return Overloaded(max(1, math.ceil(self.estimate_wait())))
+
+    async def acquire(self):
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+            return
+        # 排队已满，或估算等待时间超过期限时直接拒绝，避免请求在队列中超时
+        if len(self._waiters) >= self.max_queue or self.estimate_wait() > self.timeout:
+            raise self._reject()
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.timeout)
+        except BaseException as e:
+            if fut.done():
+                # 名额已转交给本请求
+                if isinstance(e, asyncio.TimeoutError):
+                    return
+                self.release()
+                raise
+            fut.cancel()
+            self._waiters.remove(fut)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject() from None
+            raise
+
+    def release(self, held: float | None = None):
+        """释放名额，held 为本次占用时长(秒)"""
+        if held is not None:
+            self._service += (held - self._service) * 0.1
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                # 名额直接转交给下一个排队的请求
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+
+LIMITERS: dict[str, Limiter] = (
+    {
+        "lookup": Limiter(
+            CONFIG.LOOKUP_CONCURRENCY, CONFIG.LOOKUP_QUEUE, CONFIG.ADMISSION_TIMEOUT
+        ),
+        "report": Limiter(
+            CONFIG.REPORT_CONCURRENCY, CONFIG.REPORT_QUEUE, CONFIG.ADMISSION_TIMEOUT
+        ),
+        "admin": Limiter(
+            CONFIG.ADMIN_CONCURRENCY, CONFIG.ADMIN_QUEUE, CONFIG.ADMISSION_TIMEOUT
+        ),
+        "login": Limiter(
+            CONFIG.LOGIN_CONCURRENCY, CONFIG.LOGIN_QUEUE, CONFIG.ADMISSION_TIMEOUT
+        ),
+    }
+    if CONFIG.ADMISSION_ENABLED
+    else {}
+)
+
+
+def admit(kind: str):
+    """获取某类请求的名额，未开启限制时为空操作"""
+    if limiter := LIMITERS.get(kind):
+        return limiter.slot()
+    return nullcontext()
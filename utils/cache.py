@@ -1,5 +1,6 @@
 from redis import asyncio as aioredis
 from config import CONFIG
+from utils.profiler import phase
 
 _redis = None
 
@@ -17,10 +18,12 @@ async def get_redis():
 
 
 async def redis_get(key: str):
-    redis = await get_redis()
-    return await redis.get(key)
+    with phase("cache"):
+        redis = await get_redis()
+        return await redis.get(key)
 
 
 async def redis_set(key: str, value: str, expire: int = 300):
-    redis = await get_redis()
-    await redis.set(key, value, ex=expire)
+    with phase("cache"):
+        redis = await get_redis()
+        await redis.set(key, value, ex=expire)
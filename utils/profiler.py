@@ -0,0 +1,270 @@
+import functools
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from fastapi.logger import logger
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import CONFIG
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar("_timings", default=None)
+"""当前请求各阶段耗时(秒)，未开启分析时为 None"""
+
+
+class phase:
+    """统计当前请求中某一阶段的耗时，未开启分析时为空操作"""
+
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _timings.get()
+        if self.timings is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *_):
+        if self.timings is not None:
+            elapsed = time.perf_counter() - self.start
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """统计 JSON 渲染耗时的 JSONResponse
+
+    jsonable_encoder 在 render 之前执行，其耗时计入 other
+    """
+
+    def render(self, content) -> bytes:
+        with phase("render"):
+            return super().render(content)
+
+
+class StackSampler:
+    """对事件循环线程做统计采样，聚合调用栈"""
+
+    def __init__(self, max_stacks: int = 10000):
+        self.stacks: Counter[str] = Counter()
+        """聚合后的调用栈，key 为 ; 分隔的栈帧"""
+        self.idle = 0
+        """事件循环空闲(等待 IO)时的采样数"""
+        self.max_stacks = max_stacks
+        """最多记录的不同调用栈数量"""
+        self._lock = threading.Lock()
+        self._active = 0
+        self._target: int | None = None
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """在事件循环线程中调用，开始后台采样"""
+        self._target = threading.get_ident()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def acquire(self):
+        """标记一个被采样的请求开始"""
+        self._active += 1
+        self._wake.set()
+
+    def release(self):
+        """标记一个被采样的请求结束"""
+        self._active -= 1
+        if self._active <= 0:
+            self._active = 0
+            self._wake.clear()
+
+    def _run(self):
+        interval = CONFIG.PROFILE_INTERVAL_MS / 1000
+        while True:
+            self._wake.wait()
+            if self._stopped:
+                return
+            frame = sys._current_frames().get(self._target)  # pyright: ignore[reportArgumentType]
+            if frame is not None:
+                self._record(frame)
+            del frame
+            time.sleep(interval)
+
+    def _record(self, frame):
+        # 栈顶为 selector 轮询时事件循环处于空闲，不计入热点
+        if frame.f_code.co_filename.endswith("selectors.py"):
+            with self._lock:
+                self.idle += 1
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+            frame = frame.f_back
+        key = ";".join(reversed(stack))
+        with self._lock:
+            if key in self.stacks or len(self.stacks) < self.max_stacks:
+                self.stacks[key] += 1
+
+    def hot_stacks(self, limit: int = 20):
+        with self._lock:
+            stacks = self.stacks.copy()
+            idle = self.idle
+        return {
+            "samples": sum(stacks.values()),
+            "idle": idle,
+            "stacks": [
+                {"count": count, "stack": key.split(";")}
+                for key, count in stacks.most_common(limit)
+            ],
+        }
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.idle = 0
+
+
+SAMPLER = StackSampler()
+
+
+class ProfileMiddleware:
+    """记录慢请求及其各阶段耗时，并按比例触发统计采样"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        timings: dict[str, float] = {}
+        token = _timings.set(timings)
+        sampled = (
+            CONFIG.PROFILE_SAMPLE_RATE > 0
+            and random.random() < CONFIG.PROFILE_SAMPLE_RATE
+        )
+        if sampled:
+            SAMPLER.acquire()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _timings.reset(token)
+            if sampled:
+                SAMPLER.release()
+            if elapsed * 1000 >= CONFIG.SLOW_REQUEST_MS:
+                other = elapsed - sum(timings.values())
+                detail = ", ".join(
+                    f"{name}={cost * 1000:.1f}ms" for name, cost in timings.items()
+                )
+                logger.warning(
+                    f"慢请求 {scope['method']} {scope['path']} {status_code} "
+                    f"{elapsed * 1000:.1f}ms ({detail}, other={other * 1000:.1f}ms)"
+                )
+
+
+_query_wait: ContextVar[list[float] | None] = ContextVar("_query_wait", default=None)
+"""当前查询等待数据库连接的耗时(秒)"""
+
+
+class _TimedAcquire:
+    """统计获取数据库连接(等待连接锁)耗时的包装"""
+
+    __slots__ = ("cm",)
+
+    def __init__(self, cm):
+        self.cm = cm
+
+    async def __aenter__(self):
+        start = time.perf_counter()
+        try:
+            return await self.cm.__aenter__()
+        finally:
+            if (wait := _query_wait.get()) is not None:
+                wait[0] += time.perf_counter() - start
+
+    async def __aexit__(self, *exc):
+        return await self.cm.__aexit__(*exc)
+
+
+def _wrap_acquire(func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return _TimedAcquire(func(self, *args, **kwargs))
+
+    wrapper.__profiled__ = True  # pyright: ignore[reportFunctionMemberAccess]
+    return wrapper
+
+
+def _wrap_query(func):
+    @functools.wraps(func)
+    async def wrapper(self, query: str, *args, **kwargs):
+        wait = [0.0]
+        token = _query_wait.set(wait)
+        start = time.perf_counter()
+        try:
+            return await func(self, query, *args, **kwargs)
+        finally:
+            # 扣除等待连接的时间，排队不应被记为慢查询
+            elapsed = time.perf_counter() - start - wait[0]
+            _query_wait.reset(token)
+            if (timings := _timings.get()) is not None:
+                timings["db"] = timings.get("db", 0.0) + elapsed
+                timings["db_wait"] = timings.get("db_wait", 0.0) + wait[0]
+            if elapsed * 1000 >= CONFIG.SLOW_QUERY_MS:
+                values = args[0] if args else kwargs.get("values")
+                logger.warning(
+                    f"慢查询 {elapsed * 1000:.1f}ms "
+                    f"(等待连接 {wait[0] * 1000:.1f}ms): {query} {values!r}"
+                )
+
+    wrapper.__profiled__ = True  # pyright: ignore[reportFunctionMemberAccess]
+    return wrapper
+
+
+def _subclasses(cls: type):
+    yield cls
+    for sub in cls.__subclasses__():
+        yield from _subclasses(sub)
+
+
+def install_slow_query_log(client_cls: type):
+    """包装数据库客户端及其子类(如 TransactionWrapper)的执行方法，记录慢查询并统计 db 阶段耗时"""
+    for cls in _subclasses(client_cls):
+        # 只包装类自身定义的方法，继承的方法已在父类上包装
+        if (func := cls.__dict__.get("acquire_connection")) is not None and not getattr(
+            func, "__profiled__", False
+        ):
+            setattr(cls, "acquire_connection", _wrap_acquire(func))
+        for name in (
+            "execute_query",
+            "execute_query_dict",
+            "execute_insert",
+            "execute_many",
+        ):
+            func = cls.__dict__.get(name)
+            if func is None or getattr(func, "__profiled__", False):
+                continue
+            setattr(cls, name, _wrap_query(func))
@@ -1,4 +1,8 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+import threading
+import time
 from typing import Annotated
 
 import jwt
@@ -11,6 +15,12 @@ from config import CONFIG
 SECRET_KEY = CONFIG.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+TOKEN_CACHE_SIZE = 256
+"""已验证 token 缓存的最大条数"""
+
+_token_cache: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+"""已验证的 token，key 为 token 摘要，value 为 (用户名, 过期时间戳)"""
+_token_cache_lock = threading.Lock()
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -38,6 +48,15 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    digest = sha256(token.encode()).digest()
+    with _token_cache_lock:
+        if cached := _token_cache.get(digest):
+            username, expire = cached
+            if expire > time.time():
+                _token_cache.move_to_end(digest)
+                return username
+            del _token_cache[digest]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str | None = payload.get("sub")
@@ -46,6 +65,11 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     except InvalidTokenError as e:
         raise credentials_exception from e
     if username == CONFIG.USERNAME:
+        if (expire := payload.get("exp")) is not None:
+            with _token_cache_lock:
+                _token_cache[digest] = (username, float(expire))
+                if len(_token_cache) > TOKEN_CACHE_SIZE:
+                    _token_cache.popitem(last=False)
         return username
     else:
         raise credentials_exception